@@ -81,6 +81,12 @@ ABBREVIATIONS_MAP = dict([('high school', 'hs'),
                          ('   ', ' '),
                          ('  ', ' ')])
 
+BOROUGHS = {'M': 'MANHATTAN',
+            'X': 'BRONX',
+            'K': 'BROOKLYN',
+            'Q': 'QUEENS',
+            'R': 'STATEN ISLAND'}
+
 TOTAL = ['D']
 GRP_TOTALS = ['A', 'B', 'C']
 SUBGROUPS = ['A1', 'A2', 'A3', 'A4', 'B1', 'B2', 'C1', 'C2', 'C3']
@@ -101,8 +107,11 @@ def _rename_finance(col_name):
     return col_name
 
 def _clean_cash(val):
-    if isinstance(val, str) and val[0] == '$':
-        val = float(''.join(val.split(',')).strip('$'))
+    if isinstance(val, str):
+        try:
+            val = float(val.replace(',', '').replace('$', '').strip())
+        except ValueError:
+            pass
     return val
 
 def _school_name_format(string):
@@ -130,21 +139,28 @@ def _clean(df):
     # df = df.astype(float)
     return df
 
-def name_of_file(num):
-    dist = ''
+def borough_code(num):
     if num < 7:
-        dist = 'MANHATTAN'
-        num = f' {num}'
+        code = 'M'
     elif num < 13:
-        dist = 'BRONX'
-        if num < 10:
-            num = f' {num}'
+        code = 'X'
     elif (num < 24) or (num == 32):
-        dist = 'BROOKLYN'
+        code = 'K'
     elif num < 31:
-        dist = 'QUEENS'
+        code = 'Q'
     elif num == 31:
-        dist = 'STATEN ISLAND'
+        code = 'R'
+    else:
+        raise ValueError('Not a geographic district number')
+    return code
+
+def district_code(num):
+    return f'{num:02d}{borough_code(num)}'
+
+def name_of_file(num):
+    dist = BOROUGHS[borough_code(num)]
+    if num < 10:
+        num = f' {num}'
 
     file_name = f'NYC GEOG DIST #{num} - {dist}'
     file_path = f'./data/finance_data/{file_name}.csv'
@@ -0,0 +1,188 @@
+'''
+Embedded DuckDB query layer over the cleaned finance and success tables.
+
+build() writes the cleaned frames to Parquet once and registers them as views
+in a DuckDB database, joined to a districts dimension (district code, number
+and borough). Queries then run against the Parquet files directly, so filters,
+column selection and aggregation are pushed down to the scan instead of
+loading everything into pandas.
+
+Possible function calls:
+- build()
+- connect()
+- query(sql)
+- aggregate(table, columns)
+- spending_by_borough()
+- title_one_share()
+- achievement_by_type()
+'''
+import os
+import duckdb
+import pandas as pd
+
+import finance as fin
+import success as scs
+
+DB_PATH = './data/school_data.duckdb'
+PARQUET_DIR = './data/parquet'
+TABLES = ['finance', 'success']
+AGGREGATES = ['avg', 'sum', 'min', 'max', 'median', 'stddev', 'count']
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _as_list(val):
+    if val is None:
+        return []
+    if isinstance(val, (list, tuple, set)):
+        return list(val)
+    return [val]
+
+def _finance_facts():
+    df = fin.create_frame(1, 32)
+    cols = [*fin.ALL, *fin.OTHER]
+    df[cols] = df[cols].astype(float)
+    nums = df['district'].str.extract(r'#\s*(\d+)', expand=False).astype(int)
+    df['district_code'] = nums.map(fin.district_code)
+    return df.reset_index()
+
+def _success_facts():
+    # summary_numerical keeps the rows of summary_table in order, minus DBN
+    df = scs.summary_numerical().reset_index()
+    df['dbn'] = scs.summary_table()['DBN'].to_numpy()
+    # 6-12 schools are reviewed in both the ems and hs sheets, so a school is
+    # one row per DBN and type rather than per DBN
+    target = scs.success_table().reset_index()
+    target = target.set_index(['DBN', 'type'])['achievement'].astype(float)
+    if df.duplicated(['dbn', 'type']).any() or target.index.duplicated().any():
+        raise ValueError('Success sheets have more than one row per DBN and type')
+    df = df.join(target, on=['dbn', 'type'])
+    # DBN is e.g. '01M292': district number, then borough letter, then school
+    df['district_code'] = df['dbn'].str[:3]
+    return df
+
+def _districts(codes):
+    df = pd.DataFrame({'district_code': sorted(set(codes))})
+    df['district_num'] = df['district_code'].str[:2].astype(int)
+    df['borough'] = df['district_code'].str[2].map(fin.BOROUGHS)
+    return df
+
+def build(db_path=DB_PATH, parquet_dir=PARQUET_DIR):
+    '''
+    Write the cleaned finance and success tables to Parquet and register them
+    as views in a DuckDB database file, joined to the districts dimension.
+
+    Rows are sorted by district code and school, so the Parquet row group
+    statistics let DuckDB skip row groups when filtering on either.
+
+    Arguments:
+    db_path - path of the DuckDB database file to create
+    parquet_dir - directory to write the Parquet files to
+    '''
+    os.makedirs(parquet_dir, exist_ok=True)
+    facts = {'finance': _finance_facts(), 'success': _success_facts()}
+    codes = [*facts['finance']['district_code'],
+             *facts['success']['district_code']]
+
+    with duckdb.connect(db_path) as con:
+        con.register('districts_df', _districts(codes))
+        con.execute('''CREATE OR REPLACE TABLE districts (
+                           district_code VARCHAR PRIMARY KEY,
+                           district_num INTEGER,
+                           borough VARCHAR)''')
+        con.execute('INSERT INTO districts SELECT * FROM districts_df')
+        for table, df in facts.items():
+            path = os.path.abspath(os.path.join(parquet_dir, f'{table}.parquet'))
+            path = path.replace("'", "''")
+            con.register(f'{table}_df', df)
+            con.execute(f'''COPY (SELECT * FROM {table}_df
+                                 ORDER BY district_code, school)
+                            TO '{path}' (FORMAT PARQUET)''')
+            con.execute(f'''CREATE OR REPLACE VIEW {table} AS
+                            SELECT t.*, d.district_num, d.borough
+                            FROM read_parquet('{path}') t
+                            LEFT JOIN districts d USING (district_code)''')
+    return
+
+def connect(db_path=DB_PATH):
+    '''
+    Return a read only connection to the database, building it first if it
+    does not exist yet.
+    '''
+    if not os.path.isfile(db_path):
+        build(db_path)
+    return duckdb.connect(db_path, read_only=True)
+
+def query(sql, params=None, db_path=DB_PATH):
+    '''
+    Run a SQL query against the finance, success and districts tables and
+    return the result as a DataFrame.
+
+    Arguments:
+    sql - query string, with ? placeholders for any params
+    params - list of values for the placeholders in sql
+    '''
+    with connect(db_path) as con:
+        return con.execute(sql, params or []).df()
+
+def aggregate(table, columns, by='borough', agg='avg', where=None,
+              db_path=DB_PATH):
+    '''
+    Return columns of table aggregated in DuckDB, grouped by by.
+
+    Arguments:
+    table - 'finance' or 'success'
+    columns - column name or list of column names to aggregate
+    by - column name or list of column names to group by (e.g. 'borough',
+         'district_num', 'type'), or None for a single row
+    agg - aggregate function, one of AGGREGATES
+    where - dictionary mapping column names to a value or list of values to
+            keep, e.g. {'type': 'hs'} or {'district_num': [1, 2, 3]}
+    '''
+    if table not in TABLES:
+        raise ValueError(f'Table must be one of {TABLES}')
+    if agg not in AGGREGATES:
+        raise ValueError(f'Aggregate must be one of {AGGREGATES}')
+    by = _as_list(by)
+    select = [*map(_quote, by),
+              *[f'{agg}({_quote(c)}) AS {_quote(c)}' for c in _as_list(columns)]]
+    sql = f'SELECT {", ".join(select)} FROM {table}'
+
+    conditions = []
+    params = []
+    for col, val in (where or {}).items():
+        vals = _as_list(val)
+        if not vals:
+            raise ValueError(f'No values given to filter {col} on')
+        conditions.append(f'{_quote(col)} IN ({", ".join(["?"] * len(vals))})')
+        params.extend(vals)
+    if conditions:
+        sql += f' WHERE {" AND ".join(conditions)}'
+    if by:
+        group = ', '.join(map(_quote, by))
+        sql += f' GROUP BY {group} ORDER BY {group}'
+
+    df = query(sql, params, db_path)
+    return df.set_index(by) if by else df
+
+def spending_by_borough(columns=None, agg='avg'):
+    if columns is None:
+        columns = [*fin.GRP_TOTALS, *fin.TOTAL]
+    return aggregate('finance', columns, by='borough', agg=agg)
+
+def title_one_share(by='district_num'):
+    '''
+    Return the share of total school level spending (D) funded by Federal
+    Title I Part A (K1), grouped by by (None for the citywide share).
+    '''
+    by = _as_list(by)
+    select = [*map(_quote, by), 'SUM("K1") / SUM("D") AS title_one_share']
+    sql = f'SELECT {", ".join(select)} FROM finance'
+    if by:
+        group = ', '.join(map(_quote, by))
+        sql += f' GROUP BY {group} ORDER BY {group}'
+    df = query(sql)
+    return df.set_index(by)['title_one_share'] if by else df['title_one_share']
+
+def achievement_by_type(agg='avg'):
+    return aggregate('success', 'achievement', by='type', agg=agg)['achievement']
@@ -2,10 +2,62 @@
 '''
 from bs4 import BeautifulSoup
 from selenium import webdriver
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
 import pandas as pd
+import gzip
+import hashlib
+import json
 import os
 import sys
 import re
+import zlib
+
+PAGE_STORE = './data/page_store'
+FINANCE_DIR = './data/finance_data'
+
+
+def store_page(page_source, url, kind, district_name, school_name=None,
+               store_dir=PAGE_STORE):
+    '''
+    Save a fetched page to the local page store and record it in the index.
+
+    Pages are gzipped and named by the sha256 of their contents, so a page
+    that has not changed between scrapes is only stored once. Every fetch is
+    still appended to index.jsonl along with its url and fetch timestamp.
+
+    Arguments:
+    page_source - html of the fetched page
+    url - url the page was fetched from
+    kind - 'district' for a district page, 'report' for a Financial
+           Transparency Report page
+    district_name - string containing the district name
+    school_name - string containing the school name (reports only)
+    '''
+    os.makedirs(store_dir, exist_ok=True)
+    content = page_source.encode('utf-8')
+    sha = hashlib.sha256(content).hexdigest()
+    page_path = os.path.join(store_dir, f'{sha}.html.gz')
+    if not os.path.isfile(page_path):
+        with gzip.open(page_path, 'wb') as f:
+            f.write(content)
+    entry = {'kind': kind,
+             'url': url,
+             'district': district_name,
+             'school': school_name,
+             'sha256': sha,
+             'fetched_at': datetime.now(timezone.utc).isoformat()}
+    with open(os.path.join(store_dir, 'index.jsonl'), 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+    return sha
+
+def load_page(sha, store_dir=PAGE_STORE):
+    '''
+    Return the html of the page stored under the hash of args.
+    '''
+    with gzip.open(os.path.join(store_dir, f'{sha}.html.gz'), 'rt',
+                   encoding='utf-8') as f:
+        return f.read()
 
 
 def new_window(driver, prev_windows):
@@ -44,6 +96,7 @@ def find_schools(driver, district, windows):
     driver.execute_script('''window.open("", "_blank");''')
     new_window(driver, windows)
     driver.get(new_url)
+    store_page(driver.page_source, new_url, 'district', district_name)
     section = driver.find_element_by_class_name('institution-list')
     schools = section.find_elements_by_class_name('bullet-item')
     school_links = []
@@ -51,6 +104,27 @@ def find_schools(driver, district, windows):
         school_links.append(school.find_element_by_tag_name('a'))
     return (district_name, school_links)
 
+def parse_report(page_source, school_name, district_name):
+    '''
+    Return a dictionary containing the financial data from the html of a
+    school's Financial Transparency Report page.
+
+    Arguments:
+    page_source - html of the report page
+    school_name - string containing the school name, as shown on the
+                  district page
+    district_name - string containing the district name
+    '''
+    soup = BeautifulSoup(page_source, features='lxml')
+    dict_1 = {'District':district_name}
+    for data in soup.find_all(attrs={'data-label':re.compile(rf'{re.escape(school_name)}')}):
+        if data.string and data.parent.get('class') != ['expand']:
+            if data.parent.th:
+                dict_1[data.parent.th.string] = data.string
+            else:
+                dict_1[data.parent.td.string] = data.string
+    return dict_1
+
 def get_school_data(driver, school, district_name, windows):
     '''
     Return a dictionary containing the financial data from school of args
@@ -72,14 +146,9 @@ def get_school_data(driver, school, district_name, windows):
         driver.close()
         driver.switch_to.window(windows[1])
         return None
-    soup = BeautifulSoup(driver.page_source, features='lxml')
-    dict_1 = {'District':district_name}
-    for data in soup.find_all(attrs={'data-label':re.compile(rf'{re.escape(school_name)}')}):
-        if data.string and data.parent.get('class') != ['expand']:
-            if data.parent.th:
-                dict_1[data.parent.th.string] = data.string
-            else:
-                dict_1[data.parent.td.string] = data.string
+    store_page(driver.page_source, driver.current_url, 'report',
+               district_name, school_name)
+    dict_1 = parse_report(driver.page_source, school_name, district_name)
     driver.close()
     driver.switch_to.window(windows[1])
     # if dict_1 == {'District':district_name}:
@@ -107,13 +176,26 @@ def combine_schools(driver, district):
     del windows[1]
     driver.close()
     driver.switch_to.window(windows[0])
-    df = pd.DataFrame(school_data)
-    df = df.rename({i:n for i, n in enumerate(school_names)})
-    df.to_csv(path_or_buf=f'./finance_data/{district_name}.csv')
+    write_district(district_name, school_names, school_data)
     school_names.clear()
     school_data.clear()
     return #(school_names, school_data)
 
+def write_district(district_name, school_names, school_data):
+    '''
+    Write the financial data for one district to its csv in FINANCE_DIR.
+
+    Arguments:
+    district_name - string containing the district name
+    school_names - list of school names
+    school_data - list of dictionaries of financial data, one per school
+    '''
+    df = pd.DataFrame(school_data)
+    df = df.rename({i:n for i, n in enumerate(school_names)})
+    df.index.name = 'School'
+    df.to_csv(path_or_buf=os.path.join(FINANCE_DIR, f'{district_name}.csv'))
+    return
+
 def scrape_districts(start_index, end_index=32):
     '''
     Return a list of school names and a corresponding list of financial data
@@ -165,9 +247,106 @@ def replace_missing(num):
     return
 
 
+def _normalize_name(text):
+    return ' '.join(text.split())
+
+def parse_district(page_source, district_name, district_sha):
+    '''
+    Return the names of the schools listed on the html of a district page,
+    with whitespace collapsed the way Selenium reports element text.
+
+    Arguments:
+    page_source - html of the district page
+    district_name - string containing the district name
+    district_sha - hash of the stored district page (for error messages)
+    '''
+    soup = BeautifulSoup(page_source, features='lxml')
+    section = soup.find(class_='institution-list')
+    if section is None:
+        raise ValueError(f'No school list on stored page for {district_name} '
+                         f'(sha256 {district_sha})')
+    return [_normalize_name(item.a.get_text())
+            for item in section.find_all(class_='bullet-item') if item.a]
+
+def rebuild_district(district_name, district_sha, reports, store_dir=PAGE_STORE):
+    '''
+    Rebuild the csv for one district from the page store.
+
+    Only schools listed on the stored district page are written, in page
+    order, matching an online scrape. Listed schools without a stored report
+    and stored reports for schools no longer listed are printed.
+
+    Arguments:
+    district_name - string containing the district name
+    district_sha - hash of the stored district page
+    reports - dictionary mapping school names, as saved by the scraper, to the
+              hash of their stored Financial Transparency Report page
+    '''
+    by_name = {_normalize_name(name): name for name in reports}
+    listed = parse_district(load_page(district_sha, store_dir), district_name,
+                            district_sha)
+    order = [name for name in listed if name in by_name]
+    for name in listed:
+        if name not in by_name:
+            print(f'{district_name}: no stored report for {name}')
+    for name in by_name:
+        if name not in listed:
+            print(f'{district_name}: {name} not on district page, skipped')
+
+    school_names = []
+    school_data = []
+    for name in order:
+        school_name = by_name[name]
+        page_source = load_page(reports[school_name], store_dir)
+        school_data.append(parse_report(page_source, school_name,
+                                        district_name))
+        school_names.append(school_name)
+    write_district(district_name, school_names, school_data)
+    return district_name
+
+def rebuild_from_store(store_dir=PAGE_STORE, workers=None):
+    '''
+    Rebuild every district csv from the page store, without a browser or
+    network access. The most recent fetch of each page is used, and districts
+    are parsed in parallel across cores. A district whose stored pages are
+    missing, corrupt or cannot be parsed, and any malformed index line, is
+    reported and skipped.
+
+    Arguments:
+    workers - number of worker processes (defaults to the number of cores)
+    '''
+    districts = {}
+    reports = {}
+    with open(os.path.join(store_dir, 'index.jsonl')) as f:
+        for i, line in enumerate(f, 1):
+            try:
+                entry = json.loads(line)
+                district, sha = entry['district'], entry['sha256']
+                if entry['kind'] == 'district':
+                    districts[district] = sha
+                else:
+                    reports.setdefault(district, {})[entry['school']] = sha
+            except (ValueError, KeyError, TypeError) as e:
+                print(f'index.jsonl line {i} skipped: {e!r}')
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(rebuild_district, name, sha,
+                               reports.get(name, {}), store_dir)
+                   for name, sha in districts.items()]
+        rebuilt = []
+        for name, future in zip(districts, futures):
+            try:
+                rebuilt.append(future.result())
+            except (ValueError, OSError, EOFError, zlib.error) as e:
+                print(f'{name} skipped: {e}')
+        return rebuilt
+
 def main(argv):
-    if not os.path.isdir('./data/finance_data'):
-        os.mkdir('./data/finance_data')
+    if not os.path.isdir(FINANCE_DIR):
+        os.mkdir(FINANCE_DIR)
+    if argv and argv[0] == '--offline':
+        rebuild_from_store()
+        return
     start_index = 0 if len(argv) == 0 else int(argv[0])
     end_index = 32 if len(argv) < 2 else int(argv[1])
     scrape_districts(start_index, end_index)
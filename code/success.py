@@ -7,7 +7,12 @@ Possible function calls:
 - success_table()
 - target()
 - all()
+- clear_cache()
+
+Each sheet is read and cleaned at most once per process; the public functions
+return copies of the cached frames.
 '''
+from functools import lru_cache
 import pandas as pd
 import numpy as np
 
@@ -104,18 +109,10 @@ ATTENDANCE = ['attend','chron_abs','overage']
 STAFF = ['prncpl_exp','tchrs_w_exp','tchr_attend']
 ALL = ['enroll', *RACE, *DISABIL, *ECONOMIC, *ATTENDANCE, *STAFF, *SUBJ_RATINGS]
 
-def _simple_school_type(string):
-    if string == 'High School':
-        string = 'hs'
-    elif string == 'Elementary':
-        string = 'elem'
-    elif string == 'Middle':
-        string = 'ms'
-    elif string == 'K-8':
-        string = 'elem, ms'
-    else:
-        string = 'Other'
-    return string
+SCHOOL_TYPES = {'High School': 'hs',
+                'Elementary': 'elem',
+                'Middle': 'ms',
+                'K-8': 'elem, ms'}
 
 def _percent_to_dec(val):
     if isinstance(val, str):
@@ -135,13 +132,11 @@ def _school_name_format(string):
     return string
 
 def _merge_prof(df):
-    df_prof = df[['grd_5_english', 'grd_5_math','grd_8_english', 'grd_8_math']]\
-            .fillna(0)
-    df['incm_eng'] = df_prof['grd_5_english'].add(df_prof['grd_8_english'])
-    df['incm_math'] = df_prof['grd_5_math'].add(df_prof['grd_8_math'])
-    df['incm_eng'] = df['incm_eng'].replace(to_replace=0,value=np.nan)
-    df['incm_math'] = df['incm_math'].replace(to_replace=0,value=np.nan)
+    eng = np.nansum(df[['grd_5_english', 'grd_8_english']].to_numpy(), axis=1)
+    math = np.nansum(df[['grd_5_math', 'grd_8_math']].to_numpy(), axis=1)
     df = df.drop(columns=['grd_5_english', 'grd_5_math', 'grd_8_english', 'grd_8_math'])
+    df['incm_eng'] = np.where(eng == 0, np.nan, eng)
+    df['incm_math'] = np.where(math == 0, np.nan, math)
     return df
 
 def _clean(df):
@@ -149,47 +144,53 @@ def _clean(df):
     df = df.replace(to_replace='.',value=np.nan)
     df = df.applymap(lambda x: _percent_to_dec(x))
     df = df.rename(columns=COLUMNS)
-    df['type'] = df['type'].map(lambda x: _simple_school_type(x))
+    df['type'] = df['type'].map(SCHOOL_TYPES).fillna('Other')
     df['school'] = df['school'].map(lambda x: _school_name_format(x))
     df = df.set_index(['school','type'])
     return df
 
-def summary_table():
-    ems_sum = pd.read_csv('./data/ems_success/Summary.csv')
-    hs_sum = pd.read_csv('./data/hs_success/Summary.csv')
-
-    hs_sum = _clean(hs_sum)
-    ems_sum = _clean(ems_sum)
+@lru_cache(maxsize=None)
+def _sheet(name):
+    ems = _clean(pd.read_csv(f'./data/ems_success/{name}.csv'))
+    hs = _clean(pd.read_csv(f'./data/hs_success/{name}.csv'))
+    return ems.append(hs)
 
-    summary = ems_sum.append(hs_sum)
+@lru_cache(maxsize=None)
+def _summary_table():
+    summary = _sheet('Summary').copy()
     summary['overage'] = summary.overage.fillna(0)
     return summary
 
-def summary_numerical():
-    df = summary_table()
+@lru_cache(maxsize=None)
+def _summary_numerical():
+    df = _summary_table()
     cols = [*list(df.columns[1:2]),*list(df.columns[9:15]),\
             *list(df.columns[26:])]
     summary_numer = df[cols].astype(float)
     summary_numer = _merge_prof(summary_numer)
     return summary_numer
 
-def success_table():
-    ems_success = pd.read_csv('./data/ems_success/Student Achievement.csv')
-    hs_success = pd.read_csv('./data/hs_success/Student Achievement.csv')
+@lru_cache(maxsize=None)
+def _target():
+    return _sheet('Student Achievement')['achievement'].astype(float)
 
-    ems_success = _clean(ems_success)
-    hs_success = _clean(hs_success)
+def summary_table():
+    return _summary_table().copy()
 
-    success = ems_success.append(hs_success)
-    return success
+def summary_numerical():
+    return _summary_numerical().copy()
+
+def success_table():
+    return _sheet('Student Achievement').copy()
 
 def target():
-    df = success_table()
-    target_col = df['achievement'].astype(float)
-    return target_col
+    return _target().copy()
 
 def all():
-    df = summary_numerical()
-    combined = df.join(target())
+    combined = _summary_numerical().join(_target())
     combined = combined.reset_index(level='type')
     return combined
+
+def clear_cache():
+    for cached in (_sheet, _summary_table, _summary_numerical, _target):
+        cached.cache_clear()